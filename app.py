@@ -1,26 +1,143 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response
 import faiss
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
 from sentence_transformers import SentenceTransformer
 import ollama
+import httpx
 import webbrowser
-from threading import Timer
+from threading import Timer, Lock, Thread
+from collections import OrderedDict
+import hashlib
+import json
+import pickle
+import atexit
 import os
 
+try:
+    import fcntl
+except ImportError:
+    # Windows: only the single-process dev server runs there,
+    # so query cache saves never overlap
+    fcntl = None
+
 app = Flask(__name__)
 
 # -----------------------------
 # CONFIG
 # -----------------------------
 SIMILARITY_THRESHOLD = 0.30
-TOP_K = 12
+TOP_K = 6
+FETCH_K = 24
+MMR_LAMBDA = 0.7
 MAX_CONTEXT_LENGTH = 3000
+EMBED_MODEL = "BAAI/bge-small-en"
+ONNX_MODEL_DIR = "bge-onnx"
+LLM_MODEL = "mistral:7b"
+HNSW_EF_SEARCH = 64
+USE_GPU_FAISS = os.environ.get("USE_GPU_FAISS") == "1"
+# OpenMP threads for FAISS in each process; gunicorn.conf.py
+# divides the cores between its workers
+FAISS_THREADS = int(os.environ.get("FAISS_THREADS", os.cpu_count()))
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_FILE = "query_cache.pkl"
+ANSWER_CACHE_SIZE = 256
+ENABLE_BACKUP_IMAGES = os.environ.get("ENABLE_BACKUP_IMAGES", "1") == "1"
+
+SYSTEM_PROMPT = (
+    "You are a document assistant.\n\n"
+
+    "Strict Rules:\n"
+    "1. Answer ONLY using the given context.\n"
+    "2. If the content describes a process, workflow, configuration, or login steps, "
+    "convert the answer into clear numbered step-by-step format.\n"
+    "3. If it is a theory concept, explain in clear paragraphs.\n"
+    "4. Do NOT mention the word 'context'.\n"
+    "5. If answer not present reply exactly:\n"
+    "This topic is not available in the document."
+)
+
+# -----------------------------
+# ONNX EMBEDDING MODEL
+# Export once with:
+#   optimum-cli export onnx --model BAAI/bge-small-en --task feature-extraction bge-onnx/
+# -----------------------------
+class OnnxEncoder:
+
+    def __init__(self, model_dir):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, "model.onnx"),
+            options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, sentences, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+
+        tokens = self.tokenizer(
+            sentences,
+            padding=True,
+            truncation=True,
+            max_length=512,
+            return_tensors="np"
+        )
+        feed = {
+            name: value.astype("int64")
+            for name, value in tokens.items()
+            if name in self.input_names
+        }
+
+        hidden = self.session.run(None, feed)[0]
+
+        # BGE uses the [CLS] token as the sentence embedding,
+        # same pooling as the SentenceTransformer model
+        embeddings = hidden[:, 0].astype("float32")
+
+        if normalize_embeddings:
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+        return embeddings
+
 
 # -----------------------------
 # LOAD EMBEDDING MODEL
+# ONNX Runtime sessions and torch/OpenMP thread pools are not
+# fork-safe, so each process loads its own model lazily instead
+# of inheriting one from the gunicorn preload master
 # -----------------------------
-print("Loading embedding model...")
-embed_model = SentenceTransformer("BAAI/bge-small-en")
+embed_model_lock = Lock()
+embed_model = None
+embed_model_pid = None
+
+
+def get_embed_model():
+
+    global embed_model, embed_model_pid
+
+    with embed_model_lock:
+        if embed_model_pid != os.getpid():
+            print("Loading embedding model...")
+
+            if os.path.exists(os.path.join(ONNX_MODEL_DIR, "model.onnx")):
+                embed_model = OnnxEncoder(ONNX_MODEL_DIR)
+                print("Using ONNX Runtime encoder")
+            else:
+                embed_model = SentenceTransformer(EMBED_MODEL)
+
+            embed_model_pid = os.getpid()
+
+        return embed_model
+
 
 # -----------------------------
 # LOAD FAISS INDEX + METADATA
@@ -28,40 +145,474 @@ embed_model = SentenceTransformer("BAAI/bge-small-en")
 if not os.path.exists("doc_index.faiss"):
     raise FileNotFoundError("doc_index.faiss missing. Run build_index.py")
 
-if not os.path.exists("doc_metadata.npy"):
-    raise FileNotFoundError("doc_metadata.npy missing. Run build_index.py")
+if not os.path.exists("doc_metadata.parquet") and not os.path.exists("doc_metadata.npy"):
+    raise FileNotFoundError("doc_metadata.parquet missing. Run build_index.py")
 
 print("Loading FAISS index...")
+# Loaded into memory; gunicorn workers share it copy-on-write
+# through preload_app
 index = faiss.read_index("doc_index.faiss")
-metadata = np.load("doc_metadata.npy", allow_pickle=True)
+
+# Indexes built before the HNSW switch are flat and have no search params
+if hasattr(index, "hnsw"):
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+
+# -----------------------------
+# OPTIONAL GPU SEARCH
+# Brute-force search on GPU (USE_GPU_FAISS=1, faiss-gpu build).
+# A CUDA context does not survive fork, so each process clones
+# its own GPU index on first search instead of at import (which
+# is the gunicorn master under preload_app). GPU indexes are not
+# thread-safe, so every call on them holds gpu_lock.
+# -----------------------------
+gpu_lock = Lock()
+gpu_index = None
+gpu_index_pid = None
+
+
+def get_gpu_index():
+
+    global gpu_index, gpu_index_pid
+
+    if gpu_index_pid == os.getpid():
+        return gpu_index
+
+    gpu_index = None
+    gpu_index_pid = os.getpid()
+
+    if not hasattr(faiss, "StandardGpuResources") or faiss.get_num_gpus() == 0:
+        print("GPU FAISS unavailable, using CPU index")
+        return None
+
+    try:
+        gpu_res = faiss.StandardGpuResources()
+        cpu_index = index
+
+        # HNSW has no GPU implementation, search its vectors flat instead
+        if hasattr(index, "hnsw"):
+            cpu_index = faiss.IndexFlatIP(index.d)
+            cpu_index.add(index.reconstruct_n(0, index.ntotal))
+
+        gpu_index = faiss.index_cpu_to_gpu(gpu_res, 0, cpu_index)
+        print("FAISS index moved to GPU")
+
+    except Exception as e:
+        print("GPU FAISS error, using CPU index:", e)
+
+    return gpu_index
+
+
+def index_search(query_vector, k):
+
+    if USE_GPU_FAISS:
+        with gpu_lock:
+            gpu = get_gpu_index()
+            if gpu is not None:
+                return gpu.search(query_vector, k)
+
+    return index.search(query_vector, k)
+
+
+# Metadata table indexed by FAISS id
+def load_metadata():
+
+    if os.path.exists("doc_metadata.parquet"):
+        return pq.read_table("doc_metadata.parquet", memory_map=True)
+
+    # Older builds saved a list of dicts
+    items = np.load("doc_metadata.npy", allow_pickle=True)
+
+    return pa.table({
+        "content": [m.get("content", "") for m in items],
+        "type": [m.get("type", "") for m in items],
+        "image": pa.array([m.get("image") for m in items], type=pa.string()),
+        "source_doc": [m.get("source_doc") for m in items]
+    })
+
+
+meta_tbl = load_metadata()
+num_chunks = meta_tbl.num_rows
+
+# Columns stay in Arrow buffers; values are only turned into
+# Python objects for the rows a request touches. Type checks
+# use boolean masks computed once in Arrow.
+content_col = meta_tbl.column("content")
+image_col = meta_tbl.column("image")
+source_col = meta_tbl.column("source_doc")
+
+is_text = pc.fill_null(pc.equal(meta_tbl.column("type"), "text"), False).to_numpy()
+is_image = pc.fill_null(pc.equal(meta_tbl.column("type"), "image"), False).to_numpy()
+has_image = pc.fill_null(pc.greater(pc.utf8_length(image_col), 0), False).to_numpy()
+
+# Inverted index word -> positions in indexed_image_ids for the
+# backup image search, tokenized in Arrow so chunk text is
+# never materialized as Python strings
+indexed_image_ids = np.where(is_image & has_image)[0]
+
+image_tokens = pc.utf8_split_whitespace(
+    pc.utf8_lower(content_col.take(indexed_image_ids))
+).combine_chunks()
+
+image_words = pa.table({
+    "word": pc.list_flatten(image_tokens),
+    "row": pc.list_parent_indices(image_tokens)
+}).group_by("word").aggregate([("row", "distinct")])
+
+image_word_index = dict(zip(
+    image_words.column("word").to_pylist(),
+    image_words.column("row_distinct").to_pylist()
+))
 
 print("Index loaded successfully")
 
+# -----------------------------
+# LLM CLIENT
+# One client per process, shared by its request threads, so
+# LLM calls reuse the HTTP connection pool instead of opening
+# a new connection each time. It is created lazily so gunicorn
+# workers never inherit the master's pooled sockets.
+# This adds no concurrency by itself: requests overlap only
+# through the server's threads (Flask's default, or gunicorn
+# gthread workers), and Ollama only runs those overlapping
+# calls in parallel when started with OLLAMA_NUM_PARALLEL > 1.
+# -----------------------------
+llm_client_lock = Lock()
+llm_client = None
+llm_client_pid = None
+
+
+def get_llm_client():
+
+    global llm_client, llm_client_pid
+
+    with llm_client_lock:
+        if llm_client_pid != os.getpid():
+            llm_client = ollama.Client()
+            llm_client_pid = os.getpid()
+
+        return llm_client
+
+
+# -----------------------------
+# WARMUP
+# Pay model load / first-call costs at startup instead of
+# on the first question. Runs in every serving process:
+# from __main__ for the dev server, and from the post_fork
+# hook in gunicorn.conf.py for each worker.
+# -----------------------------
+def warmup():
+    faiss.omp_set_num_threads(FAISS_THREADS)
+    get_embed_model().encode(["warmup"], convert_to_numpy=True)
+
+
+def warmup_llm():
+
+    host = OLLAMA_HOST if "://" in OLLAMA_HOST else "http://" + OLLAMA_HOST
+
+    try:
+        # One-off request with no pooled connection left behind.
+        # An empty prompt just loads the model into Ollama's memory
+        response = httpx.post(
+            f"{host}/api/generate",
+            json={"model": LLM_MODEL, "prompt": ""},
+            timeout=120
+        )
+        response.raise_for_status()
+        print("LLM warmed up")
+    except Exception as e:
+        print("LLM warmup error:", e)
+
+
+Thread(target=warmup_llm, daemon=True).start()
+
+# -----------------------------
+# LRU CACHES
+# OrderedDicts shared by all request threads
+# -----------------------------
+cache_lock = Lock()
+
+
+def cache_get(cache, key):
+    with cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+    return value
+
+
+def cache_put(cache, key, value, max_size):
+    with cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+
+# Answers keyed by SHA-1 of context + question
+answer_cache = OrderedDict()
+
+# -----------------------------
+# QUERY EMBEDDING CACHE
+# LRU of normalized query vectors, keyed by SHA-1
+# of the normalized question, kept across restarts
+# -----------------------------
+query_cache = OrderedDict()
+
+# Keys encoded by this process. Only these are saved, so a process
+# that never served a request (the gunicorn preload master, Flask's
+# reloader parent) writes nothing and cannot clobber the workers
+query_cache_new = set()
+
+if os.path.exists(QUERY_CACHE_FILE):
+    try:
+        with open(QUERY_CACHE_FILE, "rb") as f:
+            query_cache.update(pickle.load(f))
+        print("Query cache loaded:", len(query_cache))
+    except Exception as e:
+        print("Query cache load error:", e)
+
+
+def save_query_cache():
+
+    with cache_lock:
+        new_items = [
+            (key, blob) for key, blob in query_cache.items()
+            if key in query_cache_new
+        ]
+
+    if not new_items:
+        return
+
+    try:
+        # Workers exit together on shutdown; the lock makes each
+        # read-merge-write see the entries saved before it. The
+        # lock is released when the lock file is closed.
+        with open(f"{QUERY_CACHE_FILE}.lock", "a") as lock_file:
+
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            merged = OrderedDict()
+
+            if os.path.exists(QUERY_CACHE_FILE):
+                try:
+                    with open(QUERY_CACHE_FILE, "rb") as f:
+                        merged.update(pickle.load(f))
+                except Exception as e:
+                    print("Query cache load error:", e)
+
+            for key, blob in new_items:
+                merged.pop(key, None)
+                merged[key] = blob
+
+            while len(merged) > QUERY_CACHE_SIZE:
+                merged.popitem(last=False)
+
+            tmp_file = f"{QUERY_CACHE_FILE}.{os.getpid()}.tmp"
+
+            with open(tmp_file, "wb") as f:
+                pickle.dump(dict(merged), f)
+
+            os.replace(tmp_file, QUERY_CACHE_FILE)
+
+    except Exception as e:
+        print("Query cache save error:", e)
+
+
+atexit.register(save_query_cache)
+
+
+def encode_query(query):
+
+    norm_q = " ".join(query.lower().split())
+    key = hashlib.sha1(f"{EMBED_MODEL}\n{norm_q}".encode("utf-8")).hexdigest()
+
+    blob = cache_get(query_cache, key)
+
+    if blob is None:
+        # Already float32 and L2-normalized, no extra copy needed
+        query_vector = get_embed_model().encode(
+            [norm_q],
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        blob = query_vector.tobytes()
+        cache_put(query_cache, key, blob, QUERY_CACHE_SIZE)
+
+        with cache_lock:
+            query_cache_new.add(key)
+
+    return np.frombuffer(blob, dtype=np.float32).reshape(1, -1)
+
+
+# -----------------------------
+# MMR SELECTION
+# Pick k diverse chunks: relevance to the query minus
+# similarity to chunks already picked
+# -----------------------------
+def mmr(ids, scores, k):
+
+    if len(ids) <= k:
+        return ids
+
+    # Always reconstruct from the CPU index; it is safe to share
+    # between request threads
+    try:
+        vectors = np.vstack([index.reconstruct(int(i)) for i in ids])
+    except Exception as e:
+        print("MMR reconstruct error:", e)
+        return ids[:k]
+
+    # Quantized vectors come back only roughly unit length
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    pair_sim = vectors @ vectors.T
+
+    selected = [0]
+    max_sim = pair_sim[0].copy()
+
+    while len(selected) < k:
+
+        mmr_scores = MMR_LAMBDA * scores - (1 - MMR_LAMBDA) * max_sim
+        mmr_scores[selected] = -np.inf
+
+        best = int(np.argmax(mmr_scores))
+        selected.append(best)
+        max_sim = np.maximum(max_sim, pair_sim[best])
+
+    return ids[selected]
+
+
 # -----------------------------
 # SEARCH FUNCTION
 # -----------------------------
 def search(query, k=TOP_K):
 
-    query_vector = embed_model.encode([query]).astype("float32")
-    faiss.normalize_L2(query_vector)
+    query_vector = encode_query(query)
+
+    scores, indices = index_search(query_vector, FETCH_K)
+
+    idx = indices[0]
+    sc = scores[0]
+
+    # FAISS pads missing results with -1
+    valid = (idx >= 0) & (idx < num_chunks) & (sc >= SIMILARITY_THRESHOLD)
 
-    scores, indices = index.search(query_vector, k)
+    return mmr(idx[valid], sc[valid], k)
 
-    results = []
 
-    for i, idx in enumerate(indices[0]):
+# -----------------------------
+# BUILD CONTEXT
+# -----------------------------
+def build_context(results):
+
+    text_ids = results[is_text[results]]
+
+    if len(text_ids) == 0:
+        return None
+
+    # Drop duplicate chunks and fill the context budget
+    # in score order; only the lowest-ranked chunk that
+    # overflows the budget is trimmed
+    seen = set()
+    selected = []
+    chunks = {}
+    budget = MAX_CONTEXT_LENGTH
+
+    for i, text in zip(text_ids, content_col.take(text_ids).to_pylist()):
+
+        sig = hashlib.sha1(text.encode("utf-8")).digest()
 
-        if idx < len(metadata):
+        if sig in seen:
+            continue
 
-            score = scores[0][i]
+        seen.add(sig)
 
-            if score >= SIMILARITY_THRESHOLD:
-                item = metadata[idx]
+        # "\n\n" separator before every chunk but the first
+        if selected:
+            budget -= 2
 
-                if "content" in item and "type" in item:
-                    results.append(item)
+        if budget <= 0:
+            break
 
-    return results
+        if len(text) > budget:
+            text = text[:budget]
+
+        selected.append(i)
+        chunks[i] = text
+        budget -= len(text)
+
+        if budget <= 0:
+            break
+
+    # Document order, so the same evidence always gives a
+    # byte-identical prompt and Ollama can reuse its prefix cache
+    sources = dict(zip(
+        selected,
+        source_col.take(np.array(selected, dtype=np.int64)).to_pylist()
+    ))
+    selected.sort(key=lambda i: (sources[i] or "", i))
+    text_chunks = [chunks[i] for i in selected]
+
+    return "\n\n".join(text_chunks)
+
+
+# -----------------------------
+# LLM PROMPT
+# -----------------------------
+def build_messages(context, user_question):
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"Context:\n{context}\n\nQuestion: {user_question}"
+        }
+    ]
+
+
+def answer_key(context, user_question):
+    return hashlib.sha1(
+        f"{context}\n\n{user_question.strip()}".encode("utf-8")
+    ).digest()
+
+
+# -----------------------------
+# IMAGE RETRIEVAL (FINAL FIX)
+# Always return diagrams if topic exists
+# -----------------------------
+def find_images(results, context):
+
+    image_list = []
+
+    # Images from retrieved chunks
+    for image in image_col.take(results[is_image[results]]).to_pylist():
+        if image:
+
+            path = "/static/images/" + image
+
+            if path not in image_list:
+                image_list.append(path)
+
+    # Backup image search using context words
+    if ENABLE_BACKUP_IMAGES and len(image_list) == 0:
+
+        context_words = set(context.lower().split())
+
+        rows = set().union(
+            *(image_word_index.get(w, ()) for w in context_words)
+        )
+        candidates = indexed_image_ids[sorted(rows)]
+
+        for image in image_col.take(candidates).to_pylist():
+
+            path = "/static/images/" + image
+
+            if path not in image_list:
+                image_list.append(path)
+
+    return image_list
 
 
 # -----------------------------
@@ -109,54 +660,29 @@ def ask():
                 "images": []
             })
 
-        # -----------------------------
-        # BUILD CONTEXT
-        # -----------------------------
-        text_chunks = []
-
-        for r in results:
-            if r.get("type") == "text":
-                text_chunks.append(r["content"])
+        context = build_context(results)
 
-        if len(text_chunks) == 0:
+        if context is None:
             return jsonify({
                 "answer": "This topic is not available in the document.",
                 "images": []
             })
 
-        context = "\n\n".join(text_chunks)
-        context = context[:MAX_CONTEXT_LENGTH]
-
         # -----------------------------
         # LLM CALL
         # -----------------------------
+        key = answer_key(context, user_question)
+        answer = cache_get(answer_cache, key)
+
         try:
-            response = ollama.chat(
-                model="mistral:7b",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a document assistant.\n\n"
-
-                            "Strict Rules:\n"
-                            "1. Answer ONLY using the given context.\n"
-                            "2. If the content describes a process, workflow, configuration, or login steps, "
-                            "convert the answer into clear numbered step-by-step format.\n"
-                            "3. If it is a theory concept, explain in clear paragraphs.\n"
-                            "4. Do NOT mention the word 'context'.\n"
-                            "5. If answer not present reply exactly:\n"
-                            "This topic is not available in the document."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Context:\n{context}\n\nQuestion: {user_question}"
-                    }
-                ]
-            )
-
-            answer = response["message"]["content"].strip()
+            if answer is None:
+                response = get_llm_client().chat(
+                    model=LLM_MODEL,
+                    messages=build_messages(context, user_question)
+                )
+
+                answer = response["message"]["content"].strip()
+                cache_put(answer_cache, key, answer, ANSWER_CACHE_SIZE)
 
         except Exception as e:
             print("LLM error:", e)
@@ -165,38 +691,7 @@ def ask():
                 "images": []
             })
 
-        # -----------------------------
-        # IMAGE RETRIEVAL (FINAL FIX)
-        # Always return diagrams if topic exists
-        # -----------------------------
-        image_list = []
-
-        # Images from retrieved chunks
-        for r in results:
-            if r.get("type") == "image" and r.get("image"):
-
-                path = "/static/images/" + r["image"]
-
-                if path not in image_list:
-                    image_list.append(path)
-
-        # Backup image search using context words
-        if len(image_list) == 0:
-
-            context_words = context.lower().split()
-
-            for item in metadata:
-
-                if item.get("type") == "image":
-
-                    text = item.get("content", "").lower()
-
-                    if any(w in text for w in context_words):
-
-                        if item.get("image"):
-                            image_list.append(
-                                "/static/images/" + item["image"]
-                            )
+        image_list = find_images(results, context)
 
         print("Images found:", len(image_list))
         print("Answer generated\n")
@@ -215,6 +710,86 @@ def ask():
         })
 
 
+# -----------------------------
+# STREAMING ASK ROUTE
+# Server-Sent Events: answer text arrives as "chunk"
+# events, images follow in a final "done" event
+# -----------------------------
+def sse(payload):
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.route("/ask_stream")
+def ask_stream():
+
+    user_question = request.args.get("question")
+
+    def generate():
+
+        try:
+
+            if not user_question:
+                yield sse({"chunk": "Please ask a question."})
+                yield sse({"done": True, "images": []})
+                return
+
+            print("\nQuestion:", user_question)
+
+            results = search(user_question)
+
+            print("Retrieved chunks:", len(results))
+
+            context = build_context(results) if len(results) else None
+
+            if context is None:
+                yield sse({"chunk": "This topic is not available in the document."})
+                yield sse({"done": True, "images": []})
+                return
+
+            key = answer_key(context, user_question)
+            answer = cache_get(answer_cache, key)
+
+            if answer is not None:
+                yield sse({"chunk": answer})
+
+            else:
+                parts = []
+
+                try:
+                    stream = get_llm_client().chat(
+                        model=LLM_MODEL,
+                        messages=build_messages(context, user_question),
+                        stream=True
+                    )
+
+                    for part in stream:
+                        text = part["message"]["content"]
+                        parts.append(text)
+                        yield sse({"chunk": text})
+
+                except Exception as e:
+                    print("LLM error:", e)
+                    yield sse({"chunk": "Error generating answer."})
+                    yield sse({"done": True, "images": []})
+                    return
+
+                cache_put(answer_cache, key, "".join(parts).strip(), ANSWER_CACHE_SIZE)
+
+            image_list = find_images(results, context)
+
+            print("Images found:", len(image_list))
+            print("Answer streamed\n")
+
+            yield sse({"done": True, "images": image_list})
+
+        except Exception as e:
+            print("ASK stream error:", e)
+            yield sse({"chunk": "Internal server error. Check terminal."})
+            yield sse({"done": True, "images": []})
+
+    return Response(generate(), mimetype="text/event-stream")
+
+
 # -----------------------------
 # AUTO OPEN BROWSER
 # -----------------------------
@@ -226,6 +801,11 @@ def open_browser():
 # RUN SERVER
 # -----------------------------
 if __name__ == "__main__":
+    # The debug reloader parent only watches files; warm up
+    # in the child that serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        warmup()
+
     print("Server running at http://127.0.0.1:5000")
     Timer(1, open_browser).start()
     app.run(debug=True)
@@ -1,26 +1,104 @@
 import os
 import faiss
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytesseract
 from docx import Document
 from sentence_transformers import SentenceTransformer
 from PIL import Image
 import io
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
 DOC_FOLDER = "docs"
 IMAGE_FOLDER = "static/images"
+CACHE_DIR = Path("embed_cache")
+EMBED_MODEL = "BAAI/bge-small-en"
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
 
 os.makedirs(IMAGE_FOLDER, exist_ok=True)
+CACHE_DIR.mkdir(exist_ok=True)
 
 print("Loading embedding model...")
-model = SentenceTransformer("BAAI/bge-small-en")
+model = SentenceTransformer(EMBED_MODEL)
 
-metadata = []
-embeddings = []
+
+# -----------------------------
+# EMBEDDING CACHE
+# One .npy per chunk, keyed by SHA-256 of model + text,
+# so unchanged chunks are not re-embedded on rebuild
+# -----------------------------
+def cache_path(text):
+    h = hashlib.sha256(f"{EMBED_MODEL}\n{text}".encode("utf-8")).hexdigest()
+    return CACHE_DIR / f"{h}.npy"
+
+
+def embed_cached(texts):
+
+    embeddings = [None] * len(texts)
+    missing = []
+
+    for i, text in enumerate(texts):
+        path = cache_path(text)
+        if path.exists():
+            embeddings[i] = np.load(path)
+        else:
+            missing.append(i)
+
+    print("Embedding cache hits:", len(texts) - len(missing), "misses:", len(missing))
+
+    if missing:
+        # Single batched pass over misses; embeddings come back L2-normalized
+        new_embeddings = model.encode(
+            [texts[i] for i in missing],
+            batch_size=64,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=True
+        )
+
+        for i, emb in zip(missing, new_embeddings):
+            embeddings[i] = emb
+            np.save(cache_path(texts[i]), emb)
+
+    return np.array(embeddings).astype("float32")
+
+
+# Metadata is kept as parallel columns, one entry per chunk
+contents = []
+types = []
+images = []
+sources = []
 image_count = 0
 
+
+def add_chunk(content, chunk_type, image, source_doc):
+    contents.append(content)
+    types.append(chunk_type)
+    images.append(image)
+    sources.append(source_doc)
+
+
+# -----------------------------
+# OCR
+# tesseract runs as a subprocess, so threads overlap it
+# -----------------------------
+def ocr_image(image_data):
+    try:
+        image = Image.open(io.BytesIO(image_data))
+        return pytesseract.image_to_string(image).strip()
+    except Exception:
+        return ""
+
+
+ocr_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+pending_images = []
+
 doc_files = [f for f in os.listdir(DOC_FOLDER) if f.endswith(".docx")]
 
 if not doc_files:
@@ -50,15 +128,7 @@ for file in doc_files:
 
         chunk = f"{current_heading}\n{text}"
 
-        metadata.append({
-            "content": chunk,
-            "type": "text",
-            "image": None,
-            "source_doc": file
-        })
-
-        emb = model.encode(chunk, convert_to_numpy=True)
-        embeddings.append(emb)
+        add_chunk(chunk, "text", None, file)
 
     print("Extracting tables...")
 
@@ -75,15 +145,7 @@ for file in doc_files:
 
             table_text = f"{current_heading}\n" + "\n".join(table_rows)
 
-            metadata.append({
-                "content": table_text,
-                "type": "text",
-                "image": None,
-                "source_doc": file
-            })
-
-            emb = model.encode(table_text, convert_to_numpy=True)
-            embeddings.append(emb)
+            add_chunk(table_text, "text", None, file)
 
     print("Extracting images...")
 
@@ -99,50 +161,69 @@ for file in doc_files:
             if width < 200 or height < 200:
                 continue
 
- 
-            try:
-                ocr_text = pytesseract.image_to_string(image).strip()
-            except:
-                ocr_text = ""
+            # OCR runs in the pool while the remaining documents are parsed
+            pending_images.append((
+                ocr_pool.submit(ocr_image, image_data),
+                image,
+                current_heading,
+                file
+            ))
 
-            if len(ocr_text) < 5:
-                continue
+print("\nRunning OCR on", len(pending_images), "images...")
+
+for future, image, heading, file in pending_images:
+
+    ocr_text = future.result()
 
-            image_name = f"doc_image_{image_count}.png"
-            image_path = os.path.join(IMAGE_FOLDER, image_name)
-            image.save(image_path)
+    if len(ocr_text) < 5:
+        continue
 
-            image_context = (
-                f"{current_heading} diagram figure flowchart architecture illustration "
-                f"{ocr_text}"
-            )
+    image_name = f"doc_image_{image_count}.png"
+    image_path = os.path.join(IMAGE_FOLDER, image_name)
+    image.save(image_path)
 
-            metadata.append({
-                "content": image_context,
-                "type": "image",
-                "image": image_name,
-                "source_doc": file
-            })
+    image_context = (
+        f"{heading} diagram figure flowchart architecture illustration "
+        f"{ocr_text}"
+    )
 
-            emb = model.encode(image_context, convert_to_numpy=True)
-            embeddings.append(emb)
+    add_chunk(image_context, "image", image_name, file)
 
-            image_count += 1
+    image_count += 1
+
+ocr_pool.shutdown()
 
 print("\nTotal images indexed:", image_count)
 
-print("\nBuilding FAISS index...")
+print("\nEmbedding chunks:", len(contents))
 
-embeddings = np.array(embeddings).astype("float32")
+embeddings = embed_cached(contents)
 
-faiss.normalize_L2(embeddings)
+print("\nBuilding FAISS index...")
 
 dimension = embeddings.shape[1]
 
-index = faiss.IndexFlatIP(dimension)
+# HNSW graph over inner product (= cosine on normalized vectors),
+# vectors stored as 8-bit scalar codes (384 B instead of 1536 B each)
+index = faiss.IndexHNSWSQ(
+    dimension,
+    faiss.ScalarQuantizer.QT_8bit,
+    HNSW_M,
+    faiss.METRIC_INNER_PRODUCT
+)
+index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+index.train(embeddings)
 index.add(embeddings)
 
 faiss.write_index(index, "doc_index.faiss")
-np.save("doc_metadata.npy", metadata)
+pq.write_table(
+    pa.table({
+        "content": contents,
+        "type": types,
+        "image": pa.array(images, type=pa.string()),
+        "source_doc": sources
+    }),
+    "doc_metadata.parquet"
+)
 
 print("Index built successfully")
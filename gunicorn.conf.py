@@ -0,0 +1,30 @@
+# -----------------------------
+# GUNICORN CONFIG
+# Run with: gunicorn app:app
+#
+# preload_app loads the FAISS index and metadata once in the
+# master; workers inherit them copy-on-write after fork. The
+# embedding model is not fork-safe, so each worker loads and
+# warms up its own in post_fork.
+# -----------------------------
+import os
+
+bind = "127.0.0.1:5000"
+
+workers = 4
+worker_class = "gthread"
+threads = 2
+
+# Split the cores between workers instead of giving each
+# worker a full-size FAISS OpenMP pool
+os.environ.setdefault("FAISS_THREADS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+preload_app = True
+
+# LLM answers can take longer than the 30 s default
+timeout = 120
+
+
+def post_fork(server, worker):
+    import app
+    app.warmup()